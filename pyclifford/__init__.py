@@ -3,7 +3,7 @@
 # import circuit
 # import qchem
 from .paulialg import (
-    Pauli,PauliList,PauliMonomial,PauliPolynomial,
+    Pauli,PauliList,PackedPauliList,PauliMonomial,PauliPolynomial,
     pauli, paulis, pauli_identity, pauli_zero)
 from .stabilizer import(
     CliffordMap,StabilizerState,
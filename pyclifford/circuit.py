@@ -202,7 +202,7 @@ class MeasureLayer(object):
     def __repr__(self):
         return '|Mz[{}]|'.format(','.join(str(qubit) for qubit in self.qubits))
     def obs_gs_ps(self):
-        ps = np.zeros(len(self.qubits)).astype(int)
+        ps = np.zeros(len(self.qubits), dtype=np.uint8)
         gs = np.zeros((len(self.qubits),2*self.N)).astype(int)
         for i in range(len(self.qubits)):
             gs[i,2*self.qubits[i]+1]=1
@@ -213,6 +213,7 @@ class MeasureLayer(object):
         '''
         if not isinstance(obj,StabilizerState):
             raise NotImplementedError("the object is not a stabilizer state")
+        obj._ensure_writable()
         tmp_gs_stb, tmp_ps_stb, tmp_r, tmp_out, tmp_log2prob = \
         stabilizer_measure(obj.gs,obj.ps,self.gs,self.ps,obj.r)
         self.result = (-1)**tmp_out
@@ -685,35 +686,35 @@ def H(*qubits):
     if len(qubits)!=1:
         raise ValueError("Hadmand gate only acts on a single qubit.")
     gate = CliffordGate(*qubits)
-    f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([0,0]))
+    f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([0,0], dtype=np.uint8))
     gate.set_forward_map(f_map)
     return gate
 def S(*qubits):
     if len(qubits)!=1:
         raise ValueError("S gate only acts on a single qubit.")
     gate = CliffordGate(*qubits)
-    f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([0,0]))
+    f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([0,0], dtype=np.uint8))
     gate.set_forward_map(f_map)
     return gate
 def X(*qubits):
     if len(qubits)!=1:
         raise ValueError("X gate only acts on a single qubit.")
     gate = CliffordGate(*qubits)
-    f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,2]))
+    f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,2], dtype=np.uint8))
     gate.set_forward_map(f_map)
     return gate
 def Y(*qubits):
     if len(qubits)!=1:
         raise ValueError("Y gate only acts on a single qubit.")
     gate = CliffordGate(*qubits)
-    f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([2,2]))
+    f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([2,2], dtype=np.uint8))
     gate.set_forward_map(f_map)
     return gate
 def Z(*qubits):
     if len(qubits)!=1:
         raise ValueError("Z gate only acts on a single qubit.")
     gate = CliffordGate(*qubits)
-    f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([2,0]))
+    f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([2,0], dtype=np.uint8))
     gate.set_forward_map(f_map)
     return gate
 def C(num, *qubits):
@@ -722,53 +723,53 @@ def C(num, *qubits):
         raise ValueError("Single qubit Clifford gate acts on single qubit.")
     gate = CliffordGate(*qubits)
     if num == 0:
-        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([0,0]))
+        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([0,0], dtype=np.uint8))
     elif num == 1:
-        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 2:
-        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,0]))
+        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,0], dtype=np.uint8))
     elif num == 3:
-        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 4:
-        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([2,0]))
+        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([2,0], dtype=np.uint8))
     elif num == 5:
-        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([2,2]))
+        f_map = CliffordMap(gs = np.array([[1,0],[1,1]]),ps = np.array([2,2], dtype=np.uint8))
     elif num == 6:
-        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 7:
-        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([2,2]))
+        f_map = CliffordMap(gs = np.array([[1,0],[0,1]]),ps = np.array([2,2], dtype=np.uint8))
     elif num == 8:
-        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([0,0]))
+        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([0,0], dtype=np.uint8))
     elif num == 9:
-        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 10:
-        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([0,0]))
+        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([0,0], dtype=np.uint8))
     elif num == 11:
-        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 12:
-        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([2,0]))
+        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([2,0], dtype=np.uint8))
     elif num == 13:
-        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([2,2]))
+        f_map = CliffordMap(gs = np.array([[1,1],[1,0]]),ps = np.array([2,2], dtype=np.uint8))
     elif num == 14:
-        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([2,0]))
+        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([2,0], dtype=np.uint8))
     elif num == 15:
-        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([2,2]))
+        f_map = CliffordMap(gs = np.array([[1,1],[0,1]]),ps = np.array([2,2], dtype=np.uint8))
     elif num == 16:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([0,0]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([0,0], dtype=np.uint8))
     elif num == 17:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 18:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([0,0]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([0,0], dtype=np.uint8))
     elif num == 19:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([0,2]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([0,2], dtype=np.uint8))
     elif num == 20:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([2,0]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([2,0], dtype=np.uint8))
     elif num == 21:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([2,2]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,0]]),ps = np.array([2,2], dtype=np.uint8))
     elif num == 22:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([2,0]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([2,0], dtype=np.uint8))
     elif num == 23:
-        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([2,2]))
+        f_map = CliffordMap(gs = np.array([[0,1],[1,1]]),ps = np.array([2,2], dtype=np.uint8))
     else:
         raise ValueError("There are only 24 single qubit Clifford gate. Input number exceed 0-23.")
     gate.set_forward_map(f_map)
@@ -778,8 +779,8 @@ def CNOT(*qubits):
         raise ValueError("CNOT gate acts on two qubit.")
     gate = CliffordGate(*qubits)
     if qubits[0]<qubits[1]:
-        f_map = CliffordMap(gs = np.array([[1,0,1,0],[0,1,0,0],[0,0,1,0],[0,1,0,1]]),ps = np.array([0,0,0,0]))
+        f_map = CliffordMap(gs = np.array([[1,0,1,0],[0,1,0,0],[0,0,1,0],[0,1,0,1]]),ps = np.array([0,0,0,0], dtype=np.uint8))
     else:
-        f_map = CliffordMap(gs = np.array([[1,0,0,0],[0,1,0,1],[1,0,1,0],[0,0,0,1]]),ps = np.array([0,0,0,0]))
+        f_map = CliffordMap(gs = np.array([[1,0,0,0],[0,1,0,1],[1,0,1,0],[0,0,0,1]]),ps = np.array([0,0,0,0], dtype=np.uint8))
     gate.set_forward_map(f_map)
     return gate
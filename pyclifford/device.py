@@ -15,6 +15,6 @@ class ClassicalShadow(object):
 
     def snapshots(self, nsample):
         for povm in self.circuit.povm(nsample):
-            snapshot = self.state.copy()
+            snapshot = self.state.copy(lazy=True) # tableau copied by measure
             snapshot.measure(povm)
             yield snapshot
@@ -1,9 +1,9 @@
 import numpy
+import copy
 from .utils import (
     ipow, pauli_tokenize, 
     clifford_rotate, pauli_transform,
-    batch_dot, aggregate)
-import qutip as qt
+    batch_dot, aggregate, pack_xz, unpack_xz, acq_mat_packed, import_qutip)
 
 class Pauli(object):
     '''Represents a Pauli operator.
@@ -108,7 +108,7 @@ class Pauli(object):
     def as_list(self):
         '''cast a Pauli operator to a Pauli list'''
         gs = numpy.expand_dims(self.g, 0)
-        ps = numpy.array([self.p], dtype=numpy.int_)
+        ps = numpy.array([self.p], dtype=numpy.uint8)
         return PauliList(gs, ps)
 
     def rotate_by(self, generator, mask=None):
@@ -125,9 +125,10 @@ class Pauli(object):
 
     def tokenize(self):
         gs = numpy.expand_dims(self.g, 0)
-        ps = numpy.array([self.p])
+        ps = numpy.array([self.p], dtype=numpy.uint8)
         return pauli_tokenize(gs, ps)
     def to_qutip(self):
+        qt = import_qutip()
         paulis = [qt.qeye(2), qt.sigmax(), qt.sigmay(), qt.sigmaz()]
         tmp_list=[]
         for i in range(self.g.shape[0]//2):
@@ -150,7 +151,7 @@ class PauliList(object):
     ps: int (L) - array of phase indicators (i powers).'''
     def __init__(self, gs, ps = None):
         self.gs = gs
-        self.ps = numpy.zeros(self.L, dtype=numpy.int_) if ps is None else ps
+        self.ps = numpy.zeros(self.L, dtype=numpy.uint8) if ps is None else ps
 
     def __repr__(self):
         return '\n'.join([repr(pauli) for pauli in self])
@@ -166,6 +167,14 @@ class PauliList(object):
     def N(self):
         return self.gs.shape[1]//2
 
+    @property
+    def gx(self): # X-parts of Pauli strings (view of gs)
+        return self.gs[:, 0::2]
+
+    @property
+    def gz(self): # Z-parts of Pauli strings (view of gs)
+        return self.gs[:, 1::2]
+
     def __getitem__(self, item):
         if isinstance(item, (int, numpy.integer)):
             return Pauli(self.gs[item], self.ps[item])
@@ -198,11 +207,32 @@ class PauliList(object):
     def copy(self):
         return PauliList(self.gs.copy(), self.ps.copy())
 
+    def _make_cow_view(self):
+        '''Shallow copy holding read-only views of gs and ps of self, which 
+            makes its own copies on the first in-place modification (copy-on-write).
+            self is left untouched, so the view is only safe to use if self
+            is not modified before the view is.'''
+        other = copy.copy(self)
+        other.gs, other.ps = self.gs.view(), self.ps.view()
+        other.gs.flags.writeable = False
+        other.ps.flags.writeable = False
+        return other
+
+    def _ensure_writable(self):
+        '''Make private copies of gs and ps if they are shared read-only views
+            (to be called before any in-place modification).'''
+        if not self.gs.flags.writeable:
+            self.gs = self.gs.copy()
+        if not self.ps.flags.writeable:
+            self.ps = self.ps.copy()
+        return self
+
     def as_polynomial(self):
         return PauliPolynomial(self.gs, self.ps)
 
     def rotate_by(self, generator, mask=None):
         # perform Clifford rotation by Pauli generator (in-place)
+        self._ensure_writable()
         if mask is None:
             clifford_rotate(generator.g, generator.p, self.gs, self.ps)
         else:
@@ -217,6 +247,7 @@ class PauliList(object):
             self.gs, self.ps = pauli_transform(self.gs, self.ps, 
                 clifford_map.gs, clifford_map.ps)
         else:
+            self._ensure_writable()
             # print("mask: ",mask)
             mask2 = numpy.repeat(mask, 2)
             # print("shape of mask2:",self.gs[:,mask2].shape)
@@ -228,7 +259,14 @@ class PauliList(object):
 
     def tokenize(self):
         return pauli_tokenize(self.gs, self.ps)
+
+    def pack(self):
+        '''cast the Pauli list to its bit-packed form'''
+        xs, zs = pack_xz(self.gs)
+        return PackedPauliList(xs, zs, self.ps.astype(numpy.uint8), self.N)
+
     def to_qutip(self):
+        qt = import_qutip()
         lists = []
         paulis = [qt.qeye(2),qt.sigmax(),qt.sigmay(),qt.sigmaz()]
         for l in range(self.L):
@@ -245,6 +283,43 @@ class PauliList(object):
             lists.append((1j)**(self.ps[l])*qt.tensor(tmp_list))
         return lists
 
+class PackedPauliList(object):
+    '''Represents a list of Pauli operators in bit-packed form, with the X-part
+    and Z-part of Pauli strings stored separately in 64-bit words.
+
+    Parameters:
+    xs: uint64 (L, W) - packed X-parts of Pauli strings, W = ceil(N/64).
+    zs: uint64 (L, W) - packed Z-parts of Pauli strings.
+    ps: uint8 (L) - array of phase indicators (i powers).
+    N: int - number of qubits.'''
+    def __init__(self, xs, zs, ps, N):
+        self.xs = xs
+        self.zs = zs
+        self.ps = ps
+        self.N = N
+
+    def __repr__(self):
+        return repr(self.unpack())
+
+    def __len__(self):
+        return self.L
+
+    @property
+    def L(self):
+        return self.xs.shape[0]
+
+    def copy(self):
+        return PackedPauliList(self.xs.copy(), self.zs.copy(), self.ps.copy(), self.N)
+
+    def acq_mat(self):
+        '''anticommutation indicator matrix among the Pauli operators'''
+        return acq_mat_packed(self.xs, self.zs)
+
+    def unpack(self):
+        '''cast the bit-packed Pauli list back to a Pauli list'''
+        gs = unpack_xz(self.xs, self.zs, self.N)
+        return PauliList(gs, self.ps.copy())
+
 class PauliMonomial(Pauli):
     '''Represent a Pauli operator with a coefficient.
 
@@ -320,13 +395,14 @@ class PauliMonomial(Pauli):
     def as_polynomial(self):
         '''cast the Pauli monomial to a single-term Pauli polynomial'''
         gs = numpy.expand_dims(self.g, 0)
-        ps = numpy.array([self.p], dtype=numpy.int_)
+        ps = numpy.array([self.p], dtype=numpy.uint8)
         cs = numpy.array([self.c], dtype=numpy.complex_)
         return PauliPolynomial(gs, ps).set_cs(cs)
 
     def inverse(self):
         return Pauli(self.g)/(self.c * 1j**self.p)
     def to_qutip(self):
+        qt = import_qutip()
         paulis = [qt.qeye(2), qt.sigmax(), qt.sigmay(), qt.sigmaz()]
         tmp_list=[]
         for i in range(self.g.shape[0]//2):
@@ -426,6 +502,7 @@ class PauliPolynomial(PauliList):
         mask = (numpy.abs(cs) > tol)
         return PauliPolynomial(gs[mask]).set_cs(cs[mask])
     def to_qutip(self):
+        qt = import_qutip()
         paulis = [qt.qeye(2),qt.sigmax(),qt.sigmay(),qt.sigmaz()]
         summation = 0
         for l in range(self.L):
@@ -504,7 +581,7 @@ def paulis(*objs, N = None):
     # otherwise construct data for Pauli operators
     objs = [pauli(obj, N = N) for obj in objs]
     gs = numpy.stack([obj.g for obj in objs])
-    ps = numpy.array([obj.p for obj in objs])
+    ps = numpy.array([obj.p for obj in objs], dtype=numpy.uint8)
     return PauliList(gs, ps)
 
 def pauli_identity(N):
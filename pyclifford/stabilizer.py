@@ -1,12 +1,28 @@
 import numpy
-import qutip as qt
+import functools
 from numba import njit
 from .utils import (
-    acq_mat, ps0, z2inv, pauli_combine, pauli_transform, binary_repr,
-    random_pauli, random_clifford, map_to_state, state_to_map, clifford_rotate,
+    ps0, z2inv, pauli_combine, pauli_transform,
+    random_pauli, random_clifford, random_sign, map_to_state, state_to_map, clifford_rotation_tableau,
     stabilizer_project, stabilizer_measure, stabilizer_expect, 
-    stabilizer_entropy, mask, stabilizer_projection_trace,stabilizer_postselection)
-from .paulialg import Pauli, PauliList, PauliPolynomial, pauli, paulis
+    stabilizer_entropy, mask, stabilizer_projection_trace,stabilizer_postselection,
+    pack_bits, unpack_bits, z2inv_packed, pack_xz, unpack_xz, all_commute_packed,
+    pauli_combine_packed, pauli_combine_bitmask, pauli_transform_packed, stabilizer_measure_packed,
+    stabilizer_group_packed, pauli_sum_dense, import_qutip)
+from .paulialg import Pauli, PauliMonomial, PauliList, PauliPolynomial, pauli, paulis
+
+# qubit numbers from which the bit-packed kernels outperform the integer ones
+PACKED_MAP_MIN_N = 7 # compose and inverse
+PACKED_MEASURE_MIN_N = 32 # measure (packing the tableau dominates on few qubits)
+
+@functools.lru_cache(maxsize=128)
+def map_labels(N):
+    '''Row labels (X0->, Z0->, X1->, ...) of the rows displayed when a Clifford 
+    map of N qubits is printed (all rows if N <= 10, otherwise the first and 
+    the last 10 rows).'''
+    l = int(numpy.ceil(numpy.log10(N)))
+    rows = range(2*N) if N <= 10 else [*range(10), *range(2*N-10, 2*N)]
+    return tuple('{}{:<{}d}->'.format('XZ'[i%2], i//2, l) for i in rows)
 
 class CliffordMap(PauliList):
     '''Represents a Clifford map. This is a subclass of PauliList.
@@ -27,18 +43,23 @@ class CliffordMap(PauliList):
         super(CliffordMap, self).__init__(*args, **kwargs)
 
     def __repr__(self):
-        xz = {0:'X',1:'Z'}
-        l = str(int(numpy.ceil(numpy.log10(self.N))))
-        dis = '{}{:<'+l+'d}->{}'
+        if self.N == 0:
+            return 'CliffordMap()'
+        labels = map_labels(self.N)
         if self.N <= 10:
-            lns = [dis.format(xz[i%2], i//2, pauli) for i, pauli in enumerate(self)]
+            lns = [label + repr(pauli) for label, pauli in zip(labels, self)]
             return 'CliffordMap(\n{})'.format('\n'.join(lns)).replace('\n','\n  ')
         else:
-            lns1 = [dis.format(xz[i%2], i//2, pauli) for i, pauli in zip(range(10), self[:10])]
-            lns2 = [dis.format(xz[i%2], i//2, pauli) for i, pauli in zip(range(self.L-10, self.L), self[-10:])]
+            lns1 = [label + repr(pauli) for label, pauli in zip(labels[:10], self[:10])]
+            lns2 = [label + repr(pauli) for label, pauli in zip(labels[10:], self[-10:])]
             return 'CliffordMap(\n{}\n   ...\n{})'.format('\n'.join(lns1),'\n'.join(lns2)).replace('\n','\n  ')
     
-    def copy(self):
+    def copy(self, lazy=False):
+        '''Copy the Clifford map.
+            (lazy: share the tableau until the copy is modified, 
+            the original map must not be modified in the meantime)'''
+        if lazy:
+            return self._make_cow_view()
         return CliffordMap(self.gs.copy(), self.ps.copy())
 
     def to_state(self, r=None):
@@ -49,23 +70,35 @@ class CliffordMap(PauliList):
 
     def embed(self, small_map, mask):
         '''Embed a smaller map acting on a subsystem specified by qubit indices.'''
-        mask2 = numpy.repeat(mask, 2)
-        self.gs[numpy.ix_(mask2, mask2)] = small_map.gs
-        self.ps[mask2] = small_map.ps
+        self._ensure_writable()
+        rows = numpy.flatnonzero(numpy.repeat(mask, 2))
+        # flat indices of the (rows, rows) block in the tableau
+        flat_idx = (rows[:, None] * self.gs.shape[1] + rows[None, :]).ravel()
+        self.gs.flat[flat_idx] = small_map.gs.ravel()
+        self.ps[rows] = small_map.ps
         return self
 
     def compose(self, other):
         '''Returns the composition of this map with the other map (this map
         will transform first in the forward transformation). This is equivalent
         to tranforming the Pauli operators in this map by the next map.'''
-        gs, ps = pauli_transform(self.gs, self.ps, other.gs, other.ps)
+        if self.N < PACKED_MAP_MIN_N:
+            gs, ps = pauli_transform(self.gs, self.ps, other.gs, other.ps)
+        else:
+            gs, ps = pauli_transform_packed(self.gs, self.ps, other.gs, other.ps)
         return CliffordMap(gs, ps)
 
     def inverse(self):
         '''Returns the inverse of this Clifford map, (such that it composes with
         its inverse results in identity map).'''
-        gs_inv = z2inv(self.gs)
-        gs_iden, ps_mis = pauli_combine(gs_inv, self.gs, self.ps)
+        if self.N < PACKED_MAP_MIN_N:
+            gs_inv = z2inv(self.gs)
+            _, ps_mis = pauli_combine(gs_inv, self.gs, self.ps)
+        else:
+            n = 2*self.N
+            gs_inv = unpack_bits(z2inv_packed(pack_bits(self.gs), n), n)
+            xs, zs = pack_xz(self.gs)
+            _, _, ps_mis = pauli_combine_packed(gs_inv, xs, zs, self.ps)
         ps_inv = (- ps_mis - ps0(gs_inv))%4
         return CliffordMap(gs_inv, ps_inv)
 
@@ -104,8 +137,13 @@ class StabilizerState(PauliList):
     def stabilizers(self):
         return self[self.r:self.N]
     
-    def copy(self):
-        return StabilizerState(self.gs.copy(), self.ps.copy()).set_r(self.r)
+    def copy(self, lazy=False):
+        '''Copy the stabilizer state.
+            (lazy: share the tableau until the copy is modified, 
+            the original state must not be modified in the meantime)'''
+        if lazy:
+            return self._make_cow_view()
+        return StabilizerState(self.gs.copy(), ps=self.ps.copy()).set_r(self.r)
 
     def set_r(self, r=None):
         '''set log2 rank of the density matrix.'''
@@ -128,8 +166,18 @@ class StabilizerState(PauliList):
         log2prob: real - log2 probability of this set of outcomes.'''
         if isinstance(obs, StabilizerState):
             obs = obs.stabilizers
-        self.gs, self.ps, self.r, out, log2prob = stabilizer_measure(
-            self.gs, self.ps, obs.gs, obs.ps, self.r)
+        if self.N < PACKED_MEASURE_MIN_N:
+            self._ensure_writable()
+            self.gs, self.ps, self.r, out, log2prob = stabilizer_measure(
+                self.gs, self.ps, obs.gs, obs.ps, self.r)
+            return out, log2prob
+        if not self.ps.flags.writeable: # gs is replaced below, only ps is modified in place
+            self.ps = self.ps.copy()
+        xs, zs = pack_xz(self.gs)
+        xs_obs, zs_obs = pack_xz(obs.gs)
+        xs, zs, self.ps, self.r, out, log2prob = stabilizer_measure_packed(
+            xs, zs, self.ps, xs_obs, zs_obs, obs.ps, self.r)
+        self.gs = unpack_xz(xs, zs, self.N)
         return out, log2prob
     def postselect(self, paulistring, postselect_res):
         '''
@@ -138,6 +186,7 @@ class StabilizerState(PauliList):
         '''
         if self.r != 0:
             raise ValueError("Currently, post-selection is only supported with pure states")
+        self._ensure_writable()
         self.gs, self.ps, prob = stabilizer_postselection(self.gs, self.ps, paulistring.g, int(postselect_res*2))
         return prob
 
@@ -156,10 +205,13 @@ class StabilizerState(PauliList):
             * PauliList [O_i]: [Tr(rho O_i z^|O_i|)]
         '''
         if isinstance(obs, Pauli):
-            return self.expect(obs.as_polynomial()) # cast Pauli to PauliPolynomial
+            # evaluate as a single-term list, coefficient 1 unless obs is a monomial
+            c = obs.c if isinstance(obs, PauliMonomial) else 1.+0.j
+            xs = stabilizer_expect(self.gs, self.ps, obs.g[None,:], numpy.array([obs.p]), self.r)
+            return c * xs[0]
         elif isinstance(obs, PauliPolynomial):
-            xs = self.expect(PauliList(obs.gs, obs.ps)) # cast PauliPolynomial to PauliList
-            return numpy.sum(obs.cs * xs)
+            xs = stabilizer_expect(self.gs, self.ps, obs.gs, obs.ps, self.r)
+            return numpy.dot(obs.cs, xs)
         elif isinstance(obs, StabilizerState):
             if self.r!=0:
                 raise NotImplementedError("Will be added in the next release!")
@@ -172,13 +224,11 @@ class StabilizerState(PauliList):
             xs = stabilizer_expect(self.gs, self.ps, obs.gs, obs.ps, self.r)
             return xs
     def to_qutip(self):
-        ID = qt.tensor([qt.qeye(2) for i in range(self.N)])
-        rho = ID
-        for i in range(self.r,self.N):
-            rho = rho*(ID+Pauli(self.gs[i],self.ps[i]).to_qutip())/2
-            # rho = rho*(ID+pauli2pauli(state.gs[i],state.ps[i]))/2
-        rho = rho/(2**self.r)
-        return rho
+        qt = import_qutip()
+        # sum the stabilizer group elements directly into a dense matrix
+        rho = self.density_matrix
+        rho = pauli_sum_dense(rho.gs, rho.ps, rho.cs)
+        return qt.Qobj(rho, dims=[[2]*self.N, [2]*self.N])
         
     def entropy(self, subsys):
         '''Entanglement entropy of the stabilizer state in a given region.'''
@@ -196,17 +246,26 @@ class StabilizerState(PauliList):
     
     def sample(self, L):
         '''Sample stabilizers from the stabilizer group.'''
-        C = numpy.random.randint(2, size=(L,self.N-self.r))
-        gs, ps = pauli_combine(C, self.gs[self.r:self.N], self.ps[self.r:self.N])
-        return PauliList(gs, ps)
+        k = self.N - self.r # number of active stabilizers
+        # 64 random selection bits per word, one row of words per sample
+        B = numpy.random.randint(0, 2**64, size=(L, (k+63)//64), dtype=numpy.uint64)
+        xs_in, zs_in = pack_xz(self.gs[self.r:self.N])
+        xs, zs, ps = pauli_combine_bitmask(B, xs_in, zs_in, self.ps[self.r:self.N])
+        return PauliList(unpack_xz(xs, zs, self.N), ps)
     def get_prob(self, readout):
         '''
         Evaluate the probability of getting a bit string readout
         '''
+        readout = numpy.asarray(readout)
         if self.N != readout.shape[0]:
-            raise Error("readout is incompitile with system size!")
-        readout_state = identity_map(self.N).to_state()
-        readout_state.ps[:self.N]=readout
+            raise ValueError("readout is incompitile with system size!")
+        stabilizers = self.stabilizers
+        if not stabilizers.gx.any(): # all active stabilizers are diagonal
+            # readout is either in the support (prob = 1/2^r) or not (prob = 0)
+            signs = (stabilizers.ps//2 + stabilizers.gz @ readout)%2
+            return 0. if signs.any() else 1./2**self.r
+        readout_state = zero_state(self.N)
+        readout_state.ps[:self.N] = 2*readout # Z_i -> (-1)^readout[i] Z_i
         return self.expect(readout_state)
 
     # !!! this function has exponential complexity.
@@ -214,8 +273,9 @@ class StabilizerState(PauliList):
     def density_matrix(self):
         '''Expand stabilizer state as density matrix in PauliPolynomial representation.
         '''
-        C = binary_repr(numpy.arange(2**(self.N-self.r)))
-        gs, ps = pauli_combine(C, self.gs[self.r:self.N], self.ps[self.r:self.N])
+        xs_in, zs_in = pack_xz(self.gs[self.r:self.N])
+        xs, zs, ps = stabilizer_group_packed(xs_in, zs_in, self.ps[self.r:self.N])
+        gs = unpack_xz(xs, zs, self.N)
         return PauliPolynomial(gs, ps) / 2**self.N
 
     def __neg__(self):
@@ -245,25 +305,25 @@ def identity_map(N):
     gs = numpy.eye(2*N, dtype=numpy.int_)
     return CliffordMap(gs)
 
-def random_pauli_map(N):
-    '''construct random Pauli map of N qubits.'''
-    gs = random_pauli(N) # shape (2*N, 2*N), mapping matrix
-    ps = 2 * numpy.random.randint(0,2,2*N) # shape (2*N), phase indicator
+def random_pauli_map(N, out_gs=None, out_ps=None):
+    '''construct random Pauli map of N qubits.
+        (out_gs, out_ps: optional arrays to fill in, reused by the map)'''
+    gs = random_pauli(N, out_gs) # shape (2*N, 2*N), mapping matrix
+    ps = random_sign(N, out_ps) # shape (2*N), phase indicator
     return CliffordMap(gs, ps)
 
-def random_clifford_map(N):
+def random_clifford_map(N, out_gs=None, out_ps=None):
     '''construct random Clifford map of N qubits.
-        drawn from N-qubit Clifford group uniformly.'''
-    gs = random_clifford(N) # shape (2*N, 2*N), mapping matrix
-    ps = 2 * numpy.random.randint(0,2,2*N) # shape (2*N), phase indicator
+        drawn from N-qubit Clifford group uniformly.
+        (out_gs, out_ps: optional arrays to fill in, reused by the map)'''
+    gs = random_clifford(N, out_gs) # shape (2*N, 2*N), mapping matrix
+    ps = random_sign(N, out_ps) # shape (2*N), phase indicator
     return CliffordMap(gs, ps)
 
 def clifford_rotation_map(gen):
     '''construct Clifford map from generator.'''
     gen = pauli(gen)
-    gs = numpy.eye(2*gen.N, dtype=numpy.int_) # initialize
-    ps = numpy.zeros(2*gen.N, dtype=numpy.int_) # initialize
-    gs, ps = clifford_rotate(gen.g, gen.p, gs, ps)
+    gs, ps = clifford_rotation_tableau(gen.g, gen.p)
     return CliffordMap(gs, ps)
 
 # ---- state constructors ----
@@ -274,22 +334,31 @@ def stabilizer_state(*stabilizers):
     stabilizers: PauliList or descriptions of stabilizers.'''
     stabilizers = paulis(*stabilizers) # parsing input to PauliList
     # validity check:
-    if not (acq_mat(stabilizers.gs) == 0).all():
+    if not all_commute_packed(*pack_xz(stabilizers.gs)):
         raise ValueError('stabilizers must all commute with each other.')
     state = maximally_mixed_state(stabilizers.N)
-    state.gs, state.r = stabilizer_project(state.gs, numpy.flipud(stabilizers.gs), state.r)
+    k = stabilizers.L
+    # impose stabilizers from the last to the first (without copying a flipped array)
+    state.gs, state.r = stabilizer_project(state.gs, stabilizers.gs, state.r, 
+                            row_order=numpy.arange(k-1, -1, -1))
     state.ps[state.r:state.N] = stabilizers.ps
     return state
 
-def maximally_mixed_state(N):
-    return identity_map(N).to_state(r=N)
+def zero_state(N, r=0):
+    '''construct the all-zero state of N qubits (or its mixture of rank r), 
+        with the tableau written directly in state order.'''
+    gs = numpy.zeros((2*N, 2*N), dtype=numpy.int_)
+    i = numpy.arange(N)
+    gs[i, 2*i+1] = 1 # Z_i stabilizers
+    gs[N+i, 2*i] = 1 # X_i destabilizers
+    return StabilizerState(gs, r=r)
 
-def zero_state(N):
-    return identity_map(N).to_state()
+def maximally_mixed_state(N):
+    return zero_state(N, r=N)
 
 def one_state(N):
     gs = zero_state(N).gs
-    ps = (2*numpy.ones(2*N)).astype(int)
+    ps = numpy.full(2*N, 2, dtype=numpy.uint8)
     return StabilizerState(gs = gs,ps = ps)
 
 def ghz_state(N):
@@ -309,7 +378,9 @@ def random_bit_state_gs_ps(N):
     for i in range(N):
         gs[i,2*i+1]=1
         gs[N+i,2*i]=1
-    ps = numpy.random.choice(numpy.array([0,2]),size = 2*N)
+    ps = numpy.empty(2*N, dtype=numpy.uint8)
+    for i in range(2*N):
+        ps[i] = 2*numpy.random.randint(2)
     return gs, ps
 def random_bit_state(N):
     gs, ps = random_bit_state_gs_ps(N)
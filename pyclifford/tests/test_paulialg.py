@@ -108,6 +108,9 @@ def test_PauliList():
     ### Test weight
     assert np.allclose(p2.weight(), np.sum((pauli_vals>0)*1, axis=1))
 
+    ### Test X-parts and Z-parts
+    assert np.allclose(p2.gx, (pauli_vals==1) | (pauli_vals==2)) and np.allclose(p2.gz, (pauli_vals==2) | (pauli_vals==3))
+
     ### Test copy
     assert np.allclose(p2.gs, p2.copy().gs) and np.allclose(p2.ps, p2.copy().ps)
 
@@ -140,3 +143,17 @@ def test_PauliPolynomial():
     for pcomp2 in p2:
         p2_op += build_pauli_string(pcomp2)
     assert (np.allclose(p.as_polynomial().trace(), np.trace(p_op))) and (np.allclose(p2.as_polynomial().trace(), np.trace(p2_op))) and (pauli('II').as_polynomial().set_cs(np.array([1.0 + 0.0j])).trace() == 4)
+
+
+def test_PackedPauliList():
+    pauli_vals = np.random.randint(4, size=(np.random.randint(1, 10), np.random.randint(60, 140)))
+    p = paulis(pauli_vals)
+    packed = p.pack()
+    assert packed.xs.dtype == np.uint64 and packed.xs.shape == (p.L, (p.N + 63)//64)
+
+    ### Test unpack
+    assert np.allclose(packed.unpack().gs, p.gs) and np.allclose(packed.unpack().ps, p.ps)
+
+    ### Test anticommutation indicator matrix
+    acq_true = (p.gs[:, 1::2] @ p.gs[:, 0::2].T + p.gs[:, 0::2] @ p.gs[:, 1::2].T) % 2
+    assert np.allclose(packed.acq_mat(), acq_true)
@@ -4,6 +4,7 @@ import qutip
 
 from ..stabilizer import *
 from ..paulialg import pauli, paulis
+from ..utils import mask, pauli_combine
 
 
 iden = np.array([[1, 0], [0, 1]])
@@ -152,6 +153,24 @@ def test_ghz_state():
         np.allclose(output_operator, input_operator)
 
 
+def test_stabilizer_state_commute():
+    n = np.random.randint(60, 140)
+    state = stabilizer_state(random_clifford_state(n).stabilizers)
+    assert state.N == n and state.r == 0
+    try:
+        stabilizer_state(paulis('XZ', 'ZZ'))
+        assert False
+    except ValueError:
+        pass
+
+
+def test_clifford_map_repr():
+    assert repr(identity_map(2)) == 'CliffordMap(\n  X0-> +XI\n  Z0-> +ZI\n  X1-> +IX\n  Z1-> +IZ)'
+    assert repr(identity_map(0)) == 'CliffordMap()'
+    lns = repr(identity_map(12)).split('\n')
+    assert len(lns) == 22 and lns[1] == '  X0 -> +XIIIIIIIIIII' and lns[-1] == '  Z11-> +IIIIIIIIIIIZ)'
+
+
 def test_maximally_mixed_state():
     nqubits = np.random.randint(1, 5)
     a = maximally_mixed_state(nqubits)
@@ -190,6 +209,40 @@ def test_compose():
     assert np.allclose(left_inverse.ps, true_map_ps)
     assert np.allclose(right_inverse.gs, true_map_gs)
     assert np.allclose(right_inverse.ps, true_map_ps)
+    # phases stay uint8 through compose, inverse and transform
+    state = random_clifford_state(nqubits).transform_by(cmap)
+    assert left_inverse.ps.dtype == right_inverse.ps.dtype == state.ps.dtype == np.uint8
+
+
+def test_random_map_buffers():
+    nqubits = np.random.randint(1, 5)
+    gs, ps = np.ones((2*nqubits, 2*nqubits), dtype=int), np.ones(2*nqubits, dtype=int)
+    for constructor in (random_pauli_map, random_clifford_map):
+        cmap = constructor(nqubits, out_gs=gs, out_ps=ps)
+        assert cmap.gs is gs and cmap.ps is ps
+        assert np.all((ps == 0) | (ps == 2))
+        assert np.allclose(cmap.compose(cmap.inverse()).gs, np.eye(2*nqubits))
+    assert random_clifford_map(nqubits).ps.dtype == np.uint8
+
+
+def test_inverse_large():
+    nqubits = np.random.randint(33, 70)
+    cmap = random_clifford_map(nqubits)
+    iden = cmap.compose(cmap.inverse())
+    assert np.allclose(iden.gs, np.eye(2*nqubits))
+    assert np.allclose(iden.ps, np.zeros(2*nqubits))
+
+
+def test_embed():
+    nqubits = np.random.randint(3, 8)
+    qubits = np.sort(np.random.choice(nqubits, 2, replace=False))
+    small_map = random_clifford_map(2)
+    cmap = identity_map(nqubits).embed(small_map, mask(qubits, nqubits))
+    rows = np.repeat(qubits, 2)*2 + np.tile([0, 1], 2)
+    assert np.allclose(cmap.gs[np.ix_(rows, rows)], small_map.gs)
+    assert np.allclose(cmap.ps[rows], small_map.ps)
+    rest = np.setdiff1d(np.arange(2*nqubits), rows)
+    assert np.allclose(cmap.gs[rest], np.eye(2*nqubits)[rest])
 
 
 def test_expectation():
@@ -212,6 +265,16 @@ def test_measure():
     assert np.all(exp>0.4) and np.all(exp<0.6)
 
 
+def test_measure_large():
+    nqubits = np.random.randint(33, 70)
+    state = random_clifford_state(nqubits)
+    obs = random_clifford_state(nqubits).stabilizers[:5] # commuting observables
+    out, log2prob = state.measure(obs)
+    # measured operators are fixed by the outcomes, repeating gives the same results
+    assert np.allclose(state.expect(obs), (-1)**out)
+    assert np.allclose(state.measure(obs)[0], out)
+
+
 def test_overlap():
     state = random_clifford_state(3)
     assert state.expect(state) == 1.0
@@ -322,3 +385,68 @@ def test_sample():
             output_operator = np.kron(output_operator, one_hot_to_pauli(output_op))
         output_operator = output_operator * 1j**phase
         assert np.allclose(output_a, np.matmul(output_operator, output_a)) or np.allclose(output_a, -np.matmul(output_operator, output_a))
+
+
+def test_density_matrix():
+    nqubits = np.random.randint(1, 5)
+    state = random_clifford_state(nqubits, np.random.randint(nqubits+1))
+    assert np.allclose(state.density_matrix.to_qutip().full(), state.to_qutip().full())
+
+    # Gray-code enumeration lands each group element at its binary-order row
+    nqubits = 14
+    state = random_clifford_state(nqubits, 1)
+    C = (np.arange(2**(nqubits-1))[:, None] >> np.arange(nqubits-2, -1, -1)) & 1
+    gs, ps = pauli_combine(C, state.stabilizers.gs, state.stabilizers.ps)
+    rho = state.density_matrix
+    assert np.allclose(rho.gs, gs) and np.allclose(rho.ps, ps)
+
+
+def test_sample_large():
+    nqubits = np.random.randint(65, 140)
+    state = random_clifford_state(nqubits, np.random.randint(3))
+    state.ps[state.r:state.N] = 2 * np.random.randint(2, size=state.N-state.r)
+    sample = state.sample(20)
+    # sampled operators are elements of the stabilizer group
+    assert np.allclose(state.expect(sample), 1)
+    assert len(np.unique(sample.gs, axis=0)) > 1
+
+
+def test_get_prob():
+    nqubits = np.random.randint(1, 5)
+    # diagonal (possibly mixed) state and a generic pure state
+    diag_state = stabilizer_state(paulis([{i: 3} for i in range(1, nqubits)], N=nqubits) if nqubits > 1 else paulis('Z'))
+    diag_state.ps[diag_state.r:diag_state.N] = 2 * np.random.randint(2, size=diag_state.N-diag_state.r)
+    for state in [diag_state, random_clifford_state(nqubits)]:
+        probs = state.to_qutip().full().diagonal().real
+        for i, readout in enumerate(np.indices((2,)*nqubits).reshape(nqubits, -1).T):
+            assert np.isclose(state.get_prob(readout), probs[i])
+
+
+def test_copy_on_write():
+    nqubits = np.random.randint(2, 6)
+    state = random_clifford_state(nqubits)
+    gs, ps = state.gs.copy(), state.ps.copy()
+    # copy owns its tableau, the original stays writable
+    state_copy = state.copy()
+    assert not np.shares_memory(state.gs, state_copy.gs)
+    state.ps[0] = (state.ps[0] + 2) % 4
+    state.gs[0, 0] ^= 1
+    assert np.allclose(state_copy.gs, gs) and np.allclose(state_copy.ps, ps)
+    # copies are snapshots even if the source map is built in a reused buffer
+    buf_gs, buf_ps = np.empty((2*nqubits, 2*nqubits), dtype=int), np.empty(2*nqubits, dtype=np.uint8)
+    cmap = random_clifford_map(nqubits, out_gs=buf_gs, out_ps=buf_ps)
+    cmap_copy, gs, ps = cmap.copy(), cmap.gs.copy(), cmap.ps.copy()
+    random_clifford_map(nqubits, out_gs=buf_gs, out_ps=buf_ps)
+    assert np.allclose(cmap_copy.gs, gs) and np.allclose(cmap_copy.ps, ps)
+    # lazy copy shares the tableau until it is modified, leaving the source intact
+    state = random_clifford_state(nqubits)
+    gs, ps = state.gs.copy(), state.ps.copy()
+    state_copy = state.copy(lazy=True)
+    assert np.shares_memory(state.gs, state_copy.gs) and state.gs.flags.writeable
+    state_copy.measure(paulis(pauli({0: 3}, nqubits)))
+    state_copy.rotate_by(pauli(np.random.randint(4, size=nqubits)))
+    assert not np.shares_memory(state.gs, state_copy.gs)
+    assert np.allclose(state.gs, gs) and np.allclose(state.ps, ps)
+    cmap_copy = cmap.copy(lazy=True)
+    cmap_copy.embed(random_clifford_map(1), mask([0], nqubits))
+    assert not np.shares_memory(cmap.gs, cmap_copy.gs)
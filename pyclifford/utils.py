@@ -1,5 +1,5 @@
 import numpy
-from numba import njit
+from numba import njit, prange
 
 '''Conventions:
 Binary represention of Pauli string. (arXiv:quant-ph/0406196)
@@ -121,14 +121,16 @@ def ps0(gs):
     gs: int (L,2*N) - array of Pauli strings in binary repr.
 
     Returns:
-    ps0: int (L) - bare phase factor x.z for all strings.'''
+    ps0: uint8 (L) - bare phase factor x.z for all strings.'''
     (L, N2) = gs.shape
     N = N2//2
-    ps0 = numpy.zeros(L, dtype=numpy.int_)
+    ps0 = numpy.empty(L, dtype=numpy.uint8)
     for j in range(L):
+        x = 0
         for i in range(N):
-            ps0[j] += gs[j,2*i] * gs[j,2*i+1]
-    return ps0 % 4
+            x += gs[j,2*i] * gs[j,2*i+1]
+        ps0[j] = x % 4
+    return ps0
 
 @njit
 def acq_mat(gs):
@@ -163,12 +165,12 @@ def batch_dot(gs1, ps1, cs1, gs2, ps2, cs2):
 
     Returns
     gs: int (L1*L2,2*N) - Pauli strings in the second polynomial.
-    ps: int (L1*L2) - phase indicators in the second polynomial.
+    ps: uint8 (L1*L2) - phase indicators in the second polynomial.
     cs: complex (L1*L2) - coefficients in the second polynomial.'''
     (L1, N2) = gs1.shape
     (L2, N2) = gs2.shape
     gs = numpy.empty((L1,L2,N2), dtype=numpy.int_)
-    ps = numpy.empty((L1,L2), dtype=numpy.int_)
+    ps = numpy.empty((L1,L2), dtype=numpy.uint8)
     cs = numpy.empty((L1,L2), dtype=numpy.complex_)
     for j1 in range(L1):
         for j2 in range(L2):
@@ -215,12 +217,12 @@ def pauli_combine(C, gs_in, ps_in):
 
     Returns:
     gs_out: int (L_out, 2*N) - output binary repr of Pauli strings.
-    ps_out: int (L_out) - phase indicators of output operators.
+    ps_out: uint8 (L_out) - phase indicators of output operators.
     '''
     (L_out, L_in) = C.shape
     N2 = gs_in.shape[-1]
     gs_out = numpy.zeros((L_out, N2), dtype=numpy.int_) # identity
-    ps_out = numpy.zeros((L_out,), dtype=numpy.int_)
+    ps_out = numpy.zeros((L_out,), dtype=numpy.uint8)
     for j_out in range(L_out):
         for j_in in range(L_in):
             if C[j_out, j_in]:
@@ -243,7 +245,9 @@ def pauli_transform(gs_in, ps_in, gs_map, ps_map):
     gs_out: int (L, 2*N) - output binary repr of Pauli strings.
     ps_out: int (L) - phase indicators of output operators.'''
     gs_out, ps_out = pauli_combine(gs_in, gs_map, ps_map)
-    ps_out = (ps_in + ps0(gs_in) + ps_out)%4
+    ps_bare = ps0(gs_in)
+    for j in range(ps_out.shape[0]): # accumulate in the uint8 output
+        ps_out[j] = (ps_in[j] + ps_bare[j] + ps_out[j])%4
     return gs_out, ps_out
 
 # ---- clifford rotation ----
@@ -265,6 +269,28 @@ def clifford_rotate(g, p, gs, ps):
             gs[j] = (gs[j] + g)%2
     return gs, ps
 
+@njit
+def clifford_rotation_tableau(g, p):
+    '''Construct the Clifford map of a rotation by a Pauli generator, applying
+    the rotation to identity map rows that anticommute with the generator only.
+
+    Parameters:
+    g: int (2*N) -  Clifford rotation generator in binary repr.
+    p: int - phase indicator (p = 0, 2 only).
+
+    Returns:
+    gs: int (2*N, 2*N) - operator map in binary representation.
+    ps: uint8 (2*N) - phase indicators associated to target operators.'''
+    N2 = g.shape[0]
+    gs = numpy.eye(N2, dtype=numpy.int_)
+    ps = numpy.zeros(N2, dtype=numpy.uint8)
+    for j in range(N2):
+        # X_i (Z_i) anticommutes with g iff g has a Z (X) component on qubit i
+        if g[j ^ 1]:
+            ps[j] = (p + 1 + ipow(gs[j], g))%4
+            gs[j] = (gs[j] + g)%2
+    return gs, ps
+
 @njit
 def clifford_rotate_signless(g, gs):
     '''Apply Clifford rotation to Pauli strings without signs.
@@ -406,22 +432,46 @@ def random_pair(N):
     return g1, g2
 
 @njit
-def random_pauli(N):
+def random_pauli(N, gs=None):
     '''Sample a random Pauli map.
 
     Parameters:
     N: int - number of qubits.
+    gs: int (2*N, 2*N) - (optional) array to fill in with the map matrix.
 
     Returs:
     gs: int (2*N, 2*N) - random Pauli map matrix.'''
-    gs = numpy.zeros((2*N,2*N), dtype=numpy.int_)
+    if gs is None:
+        gs = numpy.zeros((2*N,2*N), dtype=numpy.int_)
+    else:
+        gs[:] = 0
     for i in range(N):
         g1, g2 = random_pair(1)
         gs[2*i  ,2*i:2*i+2] = g1
         gs[2*i+1,2*i:2*i+2] = g2
     return gs
 
-def random_clifford(N):
+@njit
+def fill_random_sign(ps):
+    # draw each phase straight into ps (any int dtype)
+    for i in range(ps.shape[0]):
+        ps[i] = 2*numpy.random.randint(2)
+    return ps
+
+def random_sign(N, out=None):
+    '''Sample random phase indicators (0 or 2) of a Clifford map.
+
+    Parameters:
+    N: int - number of qubits.
+    out: int (2*N) - (optional) array to fill in with phase indicators.
+
+    Returns:
+    ps: uint8 (2*N) - random phase indicators (or out if provided).'''
+    if out is None:
+        out = numpy.empty(2*N, dtype=numpy.uint8)
+    return fill_random_sign(out)
+
+def random_clifford(N, gs=None):
     '''Sample a random Clifford map: a binary matrix with elements specifying 
     how each single Pauli operator [X0,Z0,X1,Z1,...] should gets mapped to the 
     corresponding Pauli strings. 
@@ -429,6 +479,7 @@ def random_clifford(N):
 
     Parameter:
     N: int - number of qubits.
+    gs: int (2*N, 2*N) - (optional) array to fill in with the map matrix.
 
     Returns:
     gs: int (2*N, 2*N) - random Clifford map matrix (phase not assigned).'''
@@ -450,7 +501,11 @@ def random_clifford(N):
             for g in reversed(gens):
                 gs = clifford_rotate_signless(g, gs)
         return gs
-    return random_clifford_(numpy.zeros((2*N,2*N), dtype=numpy.int_))
+    if gs is None:
+        gs = numpy.zeros((2*N,2*N), dtype=numpy.int_)
+    else:
+        gs[:] = 0
+    return random_clifford_(gs)
 
 # ---- map/state conversion ----
 @njit
@@ -499,13 +554,14 @@ def state_to_map(gs_in, ps_in):
 
 # ---- stabilizer related ----
 @njit
-def stabilizer_project(gs_stb, gs_obs, r):
+def stabilizer_project(gs_stb, gs_obs, r, row_order=None):
     '''Project stabilizer tableau to a new stabilizer basis.
 
     Parameters:
     gs_stb: int (2*N, 2*N) - Pauli strings in original stabilizer tableau.
     gs_obs: int (L, 2*N) - Pauli strings of new stablizers to impose.
     r: int - log2 rank of density matrix (num of standby stablizers).
+    row_order: int (L) - order in which rows of gs_obs are imposed (default: 0,...,L-1).
 
     Returns:
     gs_stb: int (2*N, 2*N) - Pauli strings in updated stabilizer tableau.
@@ -513,7 +569,9 @@ def stabilizer_project(gs_stb, gs_obs, r):
     (L, Ng) = gs_obs.shape
     N = Ng//2
     assert 0<=r<=N
-    for k in range(L): # loop over incoming projections gs_obs[k]
+    if row_order is None:
+        row_order = numpy.arange(L)
+    for k in row_order: # loop over incoming projections gs_obs[k]
         update = False
         extend = False
         p = 0 # pointer
@@ -766,6 +824,448 @@ def z2inv(mat):
                 a[j, i:] = (a[j, i:] + a[i, i:])%2
     return a[:,n:]
 
+# ---- bit-packed representation ----
+'''Bit-packed conventions:
+    A binary vector of length n is stored in W = ceil(n/64) words of uint64,
+    with bit j placed at position (j & 63) of word (j >> 6). A list of Pauli 
+    strings is split into its X-part and Z-part (each packed separately),
+        xs[k] = pack([x0,x1,...,x(N-1)]),  zs[k] = pack([z0,z1,...,z(N-1)])
+    such that elementary row operations become word-wise XOR, and
+        acq(g1, g2) = popcount(x1 & z2 ^ z1 & x2) % 2
+'''
+@njit
+def popcount(w):
+    '''Count the number of set bits in a 64-bit word (SWAR algorithm).
+
+    Parameters:
+    w: uint64 - a 64-bit word.
+
+    Returns:
+    n: uint64 - number of bits set to 1 in w.'''
+    w = w - ((w >> numpy.uint64(1)) & numpy.uint64(0x5555555555555555))
+    w = (w & numpy.uint64(0x3333333333333333)) + ((w >> numpy.uint64(2)) & numpy.uint64(0x3333333333333333))
+    w = (w + (w >> numpy.uint64(4))) & numpy.uint64(0x0f0f0f0f0f0f0f0f)
+    return (w * numpy.uint64(0x0101010101010101)) >> numpy.uint64(56)
+
+@njit
+def pack_bits(mat):
+    '''Pack rows of a binary matrix into 64-bit words.
+
+    Parameters:
+    mat: int (L, n) - binary matrix.
+
+    Returns:
+    words: uint64 (L, W) - packed rows, W = ceil(n/64).'''
+    (L, n) = mat.shape
+    W = (n + 63)//64
+    words = numpy.zeros((L, W), dtype=numpy.uint64)
+    for k in range(L):
+        for j in range(n):
+            words[k, j >> 6] |= numpy.uint64(mat[k, j] & 1) << numpy.uint64(j & 63)
+    return words
+
+@njit
+def unpack_bits(words, n):
+    '''Unpack rows of 64-bit words into a binary matrix.
+
+    Parameters:
+    words: uint64 (L, W) - packed rows.
+    n: int - number of columns of the binary matrix.
+
+    Returns:
+    mat: int (L, n) - binary matrix.'''
+    L = words.shape[0]
+    mat = numpy.zeros((L, n), dtype=numpy.int_)
+    for k in range(L):
+        for j in range(n):
+            mat[k, j] = (words[k, j >> 6] >> numpy.uint64(j & 63)) & numpy.uint64(1)
+    return mat
+
+@njit
+def pack_xz(gs):
+    '''Pack Pauli strings into separate X- and Z-parts of 64-bit words.
+
+    Parameters:
+    gs: int (L, 2*N) - array of Pauli strings in binary repr.
+
+    Returns:
+    xs: uint64 (L, W) - packed X-parts, W = ceil(N/64).
+    zs: uint64 (L, W) - packed Z-parts.'''
+    (L, N2) = gs.shape
+    N = N2//2
+    W = (N + 63)//64
+    xs = numpy.zeros((L, W), dtype=numpy.uint64)
+    zs = numpy.zeros((L, W), dtype=numpy.uint64)
+    for k in range(L):
+        for i in range(N):
+            xs[k, i >> 6] |= numpy.uint64(gs[k, 2*i] & 1) << numpy.uint64(i & 63)
+            zs[k, i >> 6] |= numpy.uint64(gs[k, 2*i+1] & 1) << numpy.uint64(i & 63)
+    return xs, zs
+
+@njit
+def unpack_xz(xs, zs, N):
+    '''Unpack X- and Z-parts of 64-bit words into Pauli strings.
+
+    Parameters:
+    xs: uint64 (L, W) - packed X-parts.
+    zs: uint64 (L, W) - packed Z-parts.
+    N: int - number of qubits.
+
+    Returns:
+    gs: int (L, 2*N) - array of Pauli strings in binary repr.'''
+    L = xs.shape[0]
+    gs = numpy.empty((L, 2*N), dtype=numpy.int_)
+    for k in range(L):
+        for i in range(N):
+            gs[k, 2*i] = (xs[k, i >> 6] >> numpy.uint64(i & 63)) & numpy.uint64(1)
+            gs[k, 2*i+1] = (zs[k, i >> 6] >> numpy.uint64(i & 63)) & numpy.uint64(1)
+    return gs
+
+@njit
+def acq_mat_packed(xs, zs):
+    '''Construct anticommutation indicator matrix for bit-packed Pauli strings.
+
+    Parameters:
+    xs: uint64 (L, W) - packed X-parts of Pauli strings.
+    zs: uint64 (L, W) - packed Z-parts of Pauli strings.
+
+    Returns:
+    mat: int (L,L) - anticommutation indicator matrix.'''
+    (L, W) = xs.shape
+    mat = numpy.zeros((L,L), dtype=numpy.int_)
+    for j1 in range(L):
+        for j2 in range(j1 + 1, L):
+            cnt = numpy.uint64(0)
+            for w in range(W):
+                cnt += popcount((xs[j1,w] & zs[j2,w]) ^ (zs[j1,w] & xs[j2,w]))
+            mat[j1,j2] = cnt & numpy.uint64(1)
+            mat[j2,j1] = mat[j1,j2]
+    return mat
+
+@njit
+def all_commute_packed(xs, zs):
+    '''Check if bit-packed Pauli strings all commute with each other, stop at 
+    the first anticommuting pair.
+
+    Parameters:
+    xs: uint64 (L, W) - packed X-parts of Pauli strings.
+    zs: uint64 (L, W) - packed Z-parts of Pauli strings.
+
+    Returns:
+    out: bool - True if all Pauli strings commute, False otherwise.'''
+    (L, W) = xs.shape
+    for j1 in range(L):
+        for j2 in range(j1 + 1, L):
+            cnt = numpy.uint64(0)
+            for w in range(W):
+                cnt += popcount((xs[j1,w] & zs[j2,w]) ^ (zs[j1,w] & xs[j2,w]))
+            if cnt & numpy.uint64(1):
+                return False
+    return True
+
+@njit
+def z2inv_packed(words, n):
+    '''Calculate Z2 inversion of a bit-packed binary matrix.
+
+    Parameters:
+    words: uint64 (n, W) - rows of the binary matrix packed in 64-bit words.
+    n: int - matrix dimension.
+
+    Returns:
+    inv: uint64 (n, W) - rows of the inverse matrix packed in 64-bit words.'''
+    W = words.shape[1]
+    a = words.copy() # workspace for the left part
+    b = numpy.zeros_like(a) # workspace for the right part
+    for i in range(n):
+        b[i, i >> 6] = numpy.uint64(1) << numpy.uint64(i & 63)
+    for i in range(n): # run through cols
+        w = i >> 6
+        bit = numpy.uint64(1) << numpy.uint64(i & 63)
+        if not a[i, w] & bit: # need to find pivot
+            found = False # set a flag
+            for k in range(i + 1, n):
+                if a[k, w] & bit: # a[k, i] nonzero
+                    found = True # pivot found at k
+                    break
+            if found: # if pivot found at k
+                # swap rows i, k
+                for v in range(W):
+                    tmp = a[k, v]
+                    a[k, v] = a[i, v]
+                    a[i, v] = tmp
+                    tmp = b[k, v]
+                    b[k, v] = b[i, v]
+                    b[i, v] = tmp
+            else: # if pivot not found, matrix not invertable
+                raise ValueError('binary matrix not invertable.')
+        # pivot has moved to a[i, i], eliminate col i in all other rows
+        for j in range(n):
+            if j != i and a[j, w] & bit: # a[j, i] nonzero
+                for v in range(W):
+                    a[j, v] ^= a[i, v]
+                    b[j, v] ^= b[i, v]
+    return b
+
+@njit
+def ipow_packed(x1, z1, x2, z2):
+    '''Phase indicator for the product of two bit-packed Pauli strings.
+
+    Parameters:
+    x1, z1: uint64 (W) - packed X-part and Z-part of the first Pauli string.
+    x2, z2: uint64 (W) - packed X-part and Z-part of the second Pauli string.
+
+    Returns:
+    ipow: int - the phase indicator (power of i) when product 
+        sigma[g1] with sigma[g2].'''
+    (W,) = x1.shape
+    ipow = 0
+    for w in range(W):
+        ipow += numpy.int64(popcount(z1[w] & x2[w])) - numpy.int64(popcount(x1[w] & z2[w]))
+        ipow += 2 * numpy.int64(popcount((x1[w] & x2[w] & (z1[w] ^ z2[w])) | ((x1[w] ^ x2[w]) & z1[w] & z2[w])))
+    return ipow % 4
+
+@njit(parallel=True)
+def pauli_combine_packed(C, xs_in, zs_in, ps_in):
+    '''Combine bit-packed Pauli operators by operator product.
+        (left multiplication)
+
+    Parameters:
+    C: int (L_out, L_in) - one-hot encoding of selected operators.
+    xs_in, zs_in: uint64 (L_in, W) - packed X-parts and Z-parts of input Pauli strings.
+    ps_in: int (L_in) - phase indicators of input operators.
+
+    Returns:
+    xs_out, zs_out: uint64 (L_out, W) - packed X-parts and Z-parts of output Pauli strings.
+    ps_out: uint8 (L_out) - phase indicators of output operators.'''
+    (L_out, L_in) = C.shape
+    W = xs_in.shape[-1]
+    xs_out = numpy.zeros((L_out, W), dtype=numpy.uint64) # identity
+    zs_out = numpy.zeros((L_out, W), dtype=numpy.uint64)
+    ps_out = numpy.zeros((L_out,), dtype=numpy.uint8)
+    for j_out in prange(L_out): # output operators are independent
+        for j_in in range(L_in):
+            if C[j_out, j_in]:
+                ps_out[j_out] = (ps_out[j_out] + ps_in[j_in] + ipow_packed(xs_out[j_out], zs_out[j_out], xs_in[j_in], zs_in[j_in]))%4
+                for w in range(W):
+                    xs_out[j_out, w] ^= xs_in[j_in, w]
+                    zs_out[j_out, w] ^= zs_in[j_in, w]
+    return xs_out, zs_out, ps_out
+
+@njit(parallel=True)
+def pauli_combine_bitmask(B, xs_in, zs_in, ps_in):
+    '''Combine bit-packed Pauli operators by operator product, with the 
+    selection of operators also given in bit-packed form.
+        (left multiplication)
+
+    Parameters:
+    B: uint64 (L_out, ceil(L_in/64)) - packed selection bits, bit j of row 
+        j_out selects input operator j for output operator j_out.
+    xs_in, zs_in: uint64 (L_in, W) - packed X-parts and Z-parts of input Pauli strings.
+    ps_in: int (L_in) - phase indicators of input operators.
+
+    Returns:
+    xs_out, zs_out: uint64 (L_out, W) - packed X-parts and Z-parts of output Pauli strings.
+    ps_out: uint8 (L_out) - phase indicators of output operators.'''
+    L_out = B.shape[0]
+    (L_in, W) = xs_in.shape
+    xs_out = numpy.zeros((L_out, W), dtype=numpy.uint64) # identity
+    zs_out = numpy.zeros((L_out, W), dtype=numpy.uint64)
+    ps_out = numpy.zeros((L_out,), dtype=numpy.uint8)
+    for j_out in prange(L_out): # output operators are independent
+        for j_in in range(L_in):
+            if (B[j_out, j_in >> 6] >> numpy.uint64(j_in & 63)) & numpy.uint64(1):
+                ps_out[j_out] = (ps_out[j_out] + ps_in[j_in] + ipow_packed(xs_out[j_out], zs_out[j_out], xs_in[j_in], zs_in[j_in]))%4
+                for w in range(W):
+                    xs_out[j_out, w] ^= xs_in[j_in, w]
+                    zs_out[j_out, w] ^= zs_in[j_in, w]
+    return xs_out, zs_out, ps_out
+
+@njit
+def stabilizer_group_packed(xs_stb, zs_stb, ps_stb):
+    '''Enumerate all elements of the group generated by commuting bit-packed 
+    stabilizers in Gray-code order, such that each element is obtained from 
+    the previous one by multiplying a single generator.
+
+    Parameters:
+    xs_stb, zs_stb: uint64 (k, W) - packed X-parts and Z-parts of stabilizers.
+    ps_stb: int (k) - phase indicators of stabilizers.
+
+    Returns:
+    xs_out, zs_out: uint64 (2**k, W) - packed X-parts and Z-parts of group elements.
+    ps_out: uint8 (2**k) - phase indicators of group elements.
+        (row i is the product of stabilizers j selected by bit k-1-j of i)'''
+    (k, W) = xs_stb.shape
+    xs_out = numpy.empty((1 << k, W), dtype=numpy.uint64)
+    zs_out = numpy.empty((1 << k, W), dtype=numpy.uint64)
+    ps_out = numpy.empty(1 << k, dtype=numpy.uint8)
+    xa = numpy.zeros(W, dtype=numpy.uint64) # current group element (identity)
+    za = numpy.zeros(W, dtype=numpy.uint64)
+    pa = 0
+    xs_out[0] = xa
+    zs_out[0] = za
+    ps_out[0] = pa
+    for i in range(1, 1 << k):
+        # Gray code i^(i>>1) differs from the previous one by the lowest set bit of i
+        b = 0
+        while not (i >> b) & 1:
+            b += 1
+        j = k - 1 - b # toggled stabilizer
+        # stabilizers commute and square to identity, so toggling is a product
+        pa = (pa + ps_stb[j] + ipow_packed(xa, za, xs_stb[j], zs_stb[j]))%4
+        for w in range(W):
+            xa[w] ^= xs_stb[j,w]
+            za[w] ^= zs_stb[j,w]
+        g = i ^ (i >> 1)
+        xs_out[g] = xa
+        zs_out[g] = za
+        ps_out[g] = pa
+    return xs_out, zs_out, ps_out
+
+@njit
+def pauli_transform_packed(gs_in, ps_in, gs_map, ps_map):
+    '''Transform Pauli operators by Clifford map, with the map rows combined 
+    in bit-packed form. Same input and output as pauli_transform.
+        (right multiplication)
+
+    Parameters:
+    gs_in: int (L, 2*N) - input binary repr of Pauli strings.
+    ps_in: int (L) - phase indicators of input operators.
+    gs_map: int (2*N, 2*N) - operator map in binary representation.
+    ps_map: int (2*N) - phase indicators associated to target operators.
+
+    Returns:
+    gs_out: int (L, 2*N) - output binary repr of Pauli strings.
+    ps_out: int (L) - phase indicators of output operators.'''
+    N = gs_map.shape[-1]//2
+    xs_map, zs_map = pack_xz(gs_map)
+    xs_out, zs_out, ps_out = pauli_combine_packed(gs_in, xs_map, zs_map, ps_map)
+    ps_bare = ps0(gs_in)
+    for j in range(ps_out.shape[0]): # accumulate in the uint8 output
+        ps_out[j] = (ps_in[j] + ps_bare[j] + ps_out[j])%4
+    return unpack_xz(xs_out, zs_out, N), ps_out
+
+@njit
+def stabilizer_measure_packed(xs_stb, zs_stb, ps_stb, xs_obs, zs_obs, ps_obs, r):
+    '''Measure bit-packed Pauli operators on a bit-packed stabilizer state.
+        (same algorithm as stabilizer_measure)
+
+    Parameters:
+    xs_stb, zs_stb: uint64 (2*N, W) - packed X-parts and Z-parts of stabilizer tableau.
+    ps_stb: int (N) - phase indicators of (de)stabilizers.
+    xs_obs, zs_obs: uint64 (L, W) - packed X-parts and Z-parts of Pauli operators to be measured.
+    ps_obs: int (L) - phase indicators of Pauli operators to be measured.
+    r: int - log2 rank of density matrix (num of standby stablizers).
+
+    Returns:
+    xs_stb, zs_stb: uint64 (2*N, W) - updated stabilizer tableau.
+    ps_stb: int (N) - phase indicators of (de)stabilizers.
+    r: int - updated log2 rank of density matrix.
+    out: int (L) - measurment outcomes (0 or 1 binaries).
+    log2prob: real - log2 probability of this outcome.'''
+    (L, W) = xs_obs.shape
+    N = xs_stb.shape[0]//2
+    assert 0<=r<=N
+    out = numpy.empty(L, dtype=numpy.int_)
+    xa = numpy.empty(W, dtype=numpy.uint64) # workspace for stabilizer accumulation
+    za = numpy.empty(W, dtype=numpy.uint64)
+    pa = 0 # workspace for phase accumulation
+    log2prob = 0.
+    for k in range(L): # for each observable obs[k]
+        update = False
+        extend = False
+        p = 0 # pointer
+        xa[:] = 0
+        za[:] = 0
+        pa = 0
+        for j in range(2*N):
+            cnt = numpy.uint64(0)
+            for w in range(W):
+                cnt += popcount((xs_stb[j,w] & zs_obs[k,w]) ^ (zs_stb[j,w] & xs_obs[k,w]))
+            if cnt & numpy.uint64(1): # find stb[j] anticommute with obs[k]
+                if update: # if stb[j] is not the first anticommuting operator
+                    # update stb[j] to commute with obs[k]
+                    if j < N: # if stb[j] is a stablizer, phase matters
+                        ps_stb[j] = (ps_stb[j] + ps_stb[p] + ipow_packed(xs_stb[j], zs_stb[j], xs_stb[p], zs_stb[p]))%4
+                    for w in range(W):
+                        xs_stb[j,w] ^= xs_stb[p,w]
+                        zs_stb[j,w] ^= zs_stb[p,w]
+                else: # if stb[j] is the first anticommuting operator
+                    if j < N + r: # if stb[j] is not an active destabilizer
+                        p = j # move pointer to j
+                        update = True
+                        if not r <= j < N: # if stb[j] is a standby operator
+                            extend = True
+                    else: # stb[j] anticommute with destabilizer, meaning obs[k] already a combination of active stabilizers
+                        # collect corresponding stabilizer component to (xa, za)
+                        pa = (pa + ps_stb[j-N] + ipow_packed(xa, za, xs_stb[j-N], zs_stb[j-N]))%4
+                        for w in range(W):
+                            xa[w] ^= xs_stb[j-N,w]
+                            za[w] ^= zs_stb[j-N,w]
+        if update:
+            # now stb[p] and obs[k] anticommute
+            q = (p+N)%(2*N) # get q as dual of p 
+            xs_stb[q] = xs_stb[p] # move stb[p] to stb[q]
+            zs_stb[q] = zs_stb[p]
+            xs_stb[p] = xs_obs[k] # add obs[k] to stb[p]
+            zs_stb[p] = zs_obs[k]
+            if extend:
+                r -= 1 # rank will reduce under extension
+                # bring new stabilizer from p to r
+                if p == r:
+                    pass
+                elif q == r:
+                    xs_stb[numpy.array([p,q])] = xs_stb[numpy.array([q,p])] # swap p,q
+                    zs_stb[numpy.array([p,q])] = zs_stb[numpy.array([q,p])]
+                else:
+                    s = (r+N)%(2*N) # get s as dual of r
+                    xs_stb[numpy.array([p,r])] = xs_stb[numpy.array([r,p])] # swap p,r
+                    zs_stb[numpy.array([p,r])] = zs_stb[numpy.array([r,p])]
+                    xs_stb[numpy.array([q,s])] = xs_stb[numpy.array([s,q])] # swap q,s
+                    zs_stb[numpy.array([q,s])] = zs_stb[numpy.array([s,q])]
+                p = r
+            # as long as obs[k] is not eigen, outcome will be half-to-half
+            ps_stb[p] = 2 * numpy.random.randint(2)
+            out[k] = ((ps_stb[p] - ps_obs[k])%4)//2 #0->0(+1 eigenvalue), 2->1(-1 eigenvalue)
+            log2prob -= 1.
+        else: # no update, obs[k] is eigen, result is in pa
+            assert((xa == xs_obs[k]).all() and (za == zs_obs[k]).all())
+            out[k] = ((pa - ps_obs[k])%4)//2
+    return xs_stb, zs_stb, ps_stb, r, out, log2prob
+
+# ---- dense matrix conversion ----
+@njit
+def pauli_sum_dense(gs, ps, cs):
+    '''Dense matrix of a linear combination of Pauli operators, with qubit 0
+    as the most significant bit of the computational basis index.
+
+    Parameters:
+    gs: int (L, 2*N) - array of Pauli strings in binary repr.
+    ps: int (L) - array of phase indicators (i powers).
+    cs: complex (L) - coefficients.
+
+    Returns:
+    mat: complex (2**N, 2**N) - the matrix sum_l cs[l] i^ps[l] P[l].'''
+    (L, N2) = gs.shape
+    N = N2//2
+    D = 1 << N
+    mat = numpy.zeros((D, D), dtype=numpy.complex128)
+    ipows = numpy.array([1.+0.j, 1.j, -1.+0.j, -1.j])
+    for l in range(L):
+        # bit masks of X- and Z-parts
+        x = 0
+        z = 0
+        for i in range(N):
+            x = (x << 1) | gs[l,2*i]
+            z = (z << 1) | gs[l,2*i+1]
+        # Y = iXZ on each qubit, P|b> = i^(x.z) (-1)^(b.z) |b^x>
+        c = cs[l] * ipows[(ps[l] + int(popcount(numpy.uint64(x & z))))%4]
+        for b in range(D):
+            if popcount(numpy.uint64(b & z)) & numpy.uint64(1):
+                mat[b ^ x, b] -= c
+            else:
+                mat[b ^ x, b] += c
+    return mat
+
 # ---- auxilary functions ----
 def mask(qubits, N):
     '''Create a mask vector for a subsystem of qubits.
@@ -783,6 +1283,18 @@ def mask(qubits, N):
     mask[numpy.array(qubits)] = True
     return mask
 
+def import_qutip():
+    '''Import qutip on demand, so that the package can be used without it 
+    (qutip is only needed to convert objects to qutip.Qobj).
+
+    Returns:
+    qutip: the qutip module.'''
+    try:
+        import qutip
+    except ImportError:
+        raise ImportError('qutip is required for conversion to qutip objects, please install it (pip install qutip).')
+    return qutip
+
 def binary_repr(ints, width = None):
     '''Convert an array of integers to their binary representations.
     